@@ -0,0 +1,100 @@
+import re
+from collections import Counter, deque
+
+WORD_RE = re.compile(r"[\w']{3,}")
+URL_RE = re.compile(r"https?://\S+")
+
+# Words that say nothing about what chat is talking about
+STOPWORDS = frozenset("""
+the and for are but not you your yours all any can had her was one our out has him his how its may new now old see
+two way who did get got let say she too use that this with have from they will would there their what about which
+when make like just know take into year them some could than then look only come over think also back after work
+first well even want because these give most been were said each much very more here does doing dont didnt cant
+its it's im i'm thats that's lol lmao yes yeah nah okay why where really still going gonna being should
+""".split())
+
+class ChatSummarizer:
+    """
+    Rolling window of recent chat per channel.
+    When chat is busier than rate_threshold messages per minute, lines are held back
+    and published as a compact digest every interval seconds instead.
+    """
+
+    def __init__(self, window=60, interval=60, rate_threshold=30, max_topics=5, max_questions=3):
+        self.window = window
+        self.interval = interval
+        self.rate_threshold = rate_threshold
+        self.max_topics = max_topics
+        self.max_questions = max_questions
+        self.channels = {}
+
+    def _channel(self, channel, now):
+        state = self.channels.get(channel)
+        if state is None:
+            # Timestamps of recent lines for the rate, held lines stay until the next digest
+            state = {'timestamps': deque(), 'held': [], 'last_digest': now}
+            self.channels[channel] = state
+        return state
+
+    def _prune(self, state, now):
+        timestamps = state['timestamps']
+        while timestamps and now - timestamps[0] > self.window:
+            timestamps.popleft()
+
+    def messages_per_minute(self, channel, now):
+        state = self._channel(channel, now)
+        self._prune(state, now)
+        return len(state['timestamps']) * 60.0 / self.window if self.window else 0.0
+
+    def add(self, channel, username, message, now):
+        """
+        Record a chat line. Returns True if it was held back for the digest,
+        False if chat is quiet and it should be forwarded as is.
+        """
+        state = self._channel(channel, now)
+        summarized = bool(self.rate_threshold) and self.messages_per_minute(channel, now) >= self.rate_threshold
+        state['timestamps'].append(now)
+        if summarized:
+            state['held'].append((username, message))
+        return summarized
+
+    def pop_digest(self, channel, now):
+        """Return the digest text if one is due, otherwise None"""
+        state = self.channels.get(channel)
+        if state is None or now - state['last_digest'] < self.interval:
+            return None
+
+        since = state['last_digest']
+        held, state['held'] = state['held'], []
+        state['last_digest'] = now
+        if not held:
+            return None
+        return self.build_digest(held, now - since)
+
+    def build_digest(self, messages, period):
+        users = Counter(user for user, _ in messages)
+        topics = Counter()
+        questions = Counter()
+
+        for _, text in messages:
+            text = URL_RE.sub('', text)
+            # Count each word once per message so a single spammer does not make a topic
+            words = {word.lower() for word in WORD_RE.findall(text)}
+            topics.update(word for word in words if word not in STOPWORDS and not word.isdigit())
+            if '?' in text:
+                question = ' '.join(re.sub(r"[^\w\s?']", '', text.lower()).split())
+                if question:
+                    questions[question] += 1
+
+        parts = [f"Chat summary for the last {int(period)} seconds: {len(messages)} messages from {len(users)} active users."]
+
+        top_topics = [f"{word} ({count})" for word, count in topics.most_common(self.max_topics) if count > 1]
+        if top_topics:
+            parts.append(f"Top topics: {', '.join(top_topics)}.")
+
+        repeated = [f'"{question}" (x{count})' for question, count in questions.most_common(self.max_questions) if count > 1]
+        if repeated:
+            parts.append(f"Repeated questions: {', '.join(repeated)}.")
+
+        parts.append(f"Most active: {', '.join(user for user, _ in users.most_common(3))}.")
+        return ' '.join(parts)
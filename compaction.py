@@ -0,0 +1,141 @@
+import time
+
+# Used to spot emotes when the message has no IRCv3 emotes tag
+DEFAULT_EMOTES = [
+    "Kappa", "LUL", "PogChamp", "Kreygasm", "4Head", "BibleThump", "ResidentSleeper", "NotLikeThis",
+    "DansGame", "SeemsGood", "TriHard", "CoolStoryBob", "HeyGuys", "VoHiYo", "PJSalt", "SMOrc",
+    "WutFace", "KEKW", "OMEGALUL", "LULW", "Pog", "PogU", "Sadge", "monkaS", "monkaW", "catJAM",
+    "PepeHands", "EZ", "o7"
+]
+
+# Default maximum length per notification class
+DEFAULT_MAX_LENGTH = {
+    "chat": 200,
+    "reaction": 400,
+    "event": 300,
+    "digest": 600
+}
+
+def parse_emote_tag(tag, message):
+    """
+    Emote names from an IRCv3 emotes tag, e.g. "25:0-4,12-16/1902:6-10".
+    Positions are character offsets into the message, the end is inclusive.
+    """
+    emotes = set()
+    if not tag:
+        return emotes
+    for emote in tag.split('/'):
+        _, _, ranges = emote.partition(':')
+        for position in ranges.split(','):
+            start, _, end = position.partition('-')
+            try:
+                emotes.add(message[int(start):int(end) + 1])
+            except ValueError:
+                continue
+    emotes.discard('')
+    return emotes
+
+# Longest phrase, in tokens, that is checked for back-to-back repeats
+MAX_PHRASE_TOKENS = 8
+
+def collapse_repeats(tokens, emotes, max_repeats=2):
+    """Collapse back-to-back repeats of a token or short phrase and limit how often each emote appears"""
+    # A message that is the same phrase pasted several times is kept once
+    count = len(tokens)
+    for period in range(1, count // (max_repeats + 1) + 1):
+        if count % period == 0 and tokens[:period] * (count // period) == tokens:
+            return [f"{' '.join(tokens[:period])} x{count // period}"]
+
+    collapsed = []
+    emote_counts = {}
+
+    def limit_emotes(phrase, run):
+        # An emote counts once per time a reader would see it, including inside a collapsed run
+        kept = []
+        for token in phrase:
+            if token in emotes:
+                seen = emote_counts.get(token, 0)
+                emote_counts[token] = seen + run
+                if seen >= max_repeats:
+                    continue
+            kept.append(token)
+        return kept
+
+    i = 0
+    while i < count:
+        # Pick the phrase length whose repeats cover the most tokens from here
+        best_length, best_run = 1, 1
+        for length in range(1, min(MAX_PHRASE_TOKENS, (count - i) // 2) + 1):
+            phrase = tokens[i:i + length]
+            run = 1
+            while tokens[i + run * length:i + (run + 1) * length] == phrase:
+                run += 1
+            if run > 1 and run * length > best_run * best_length:
+                best_length, best_run = length, run
+        phrase = tokens[i:i + best_length]
+        i += best_length * best_run
+
+        if best_run > max_repeats:
+            phrase = limit_emotes(phrase, best_run)
+            if phrase:
+                collapsed.append(f"{' '.join(phrase)} x{best_run}")
+        else:
+            collapsed.extend(limit_emotes(phrase * best_run, 1))
+    return collapsed
+
+def truncate(text, max_length):
+    """Cut text to max_length characters at a word boundary"""
+    if not max_length or len(text) <= max_length:
+        return text
+    cut = text[:max_length - 1]
+    if ' ' in cut[max_length // 2:]:
+        cut = cut[:cut.rindex(' ')]
+    return cut.rstrip() + "…"
+
+class PayloadCompactor:
+    """Shrink notification text before it is published and keep byte counts for the stats"""
+
+    def __init__(self, emotes=None, max_length=None, max_repeats=2, log=print):
+        self.emotes = set(DEFAULT_EMOTES if emotes is None else emotes)
+        self.max_length = dict(DEFAULT_MAX_LENGTH)
+        if isinstance(max_length, dict):
+            self.max_length.update(max_length)
+        self.max_repeats = max_repeats
+        self.log = log
+
+        self.raw_bytes = 0
+        self.published_bytes = 0
+        self.minute = None
+        self.minute_raw = 0
+        self.minute_published = 0
+
+    def compact(self, text, kind='chat', message_emotes=None, cap=True):
+        """Return the compacted text for a notification of the given kind"""
+        tokens = text.split()
+        emotes = self.emotes | message_emotes if message_emotes else self.emotes
+        compacted = ' '.join(collapse_repeats(tokens, emotes, self.max_repeats))
+        if cap:
+            compacted = truncate(compacted, self.max_length.get(kind))
+        return compacted
+
+    def record(self, raw, published):
+        """Count the bytes of a published text against the bytes it would have had uncompacted"""
+        raw_size = len(raw.encode('utf-8'))
+        published_size = len(published.encode('utf-8'))
+        self.raw_bytes += raw_size
+        self.published_bytes += published_size
+
+        minute = int(time.time() // 60)
+        if minute != self.minute:
+            if self.minute is not None and self.minute_raw:
+                self.log(f"COMPACTION - {self.minute_published / 1024:.1f} KB published in the last minute "
+                         f"(raw {self.minute_raw / 1024:.1f} KB, {self.reduction(self.minute_raw, self.minute_published):.0f}% saved)")
+            self.minute = minute
+            self.minute_raw = 0
+            self.minute_published = 0
+        self.minute_raw += raw_size
+        self.minute_published += published_size
+
+    @staticmethod
+    def reduction(raw, published):
+        return 100.0 * (raw - published) / raw if raw else 0.0
@@ -1,5 +1,5 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+from tkinter import ttk, messagebox, scrolledtext, filedialog
 from PIL import Image, ImageTk
 import json
 import os
@@ -9,8 +9,9 @@ import threading
 import queue
 import io
 from contextlib import redirect_stdout
-from typing import Dict, Any, cast, Optional, Union
-from twitch import DEFAULT_CONFIG, load_or_create_config, main as twitch_main
+from typing import Dict, Any, List, cast, Optional, Union
+from twitch import DEFAULT_CONFIG, load_or_create_config, get_immediate_reactions, main as twitch_main
+from pattern_bench import load_chat_log, check_patterns, run_bench, format_report
 from EDMesg.base import EDMesgEvent
 from EDMesg.TwitchIntegration import create_twitch_provider, TwitchNotificationEvent
 
@@ -36,11 +37,18 @@ class ConfigManager:
         self.config: Dict[str, Any] = {}
         self.pattern_entries: Dict[str, ttk.Entry] = {}
         self.instruction_entries: Dict[str, ttk.Entry] = {}
+        self.immediate_reactions: List[Dict[str, Any]] = []
+        self.immediate_reaction_listbox: Optional[tk.Listbox] = None
         self.immediate_reaction_entry: Optional[ttk.Entry] = None
+        self.immediate_reaction_prefix_entry: Optional[ttk.Entry] = None
+        self.immediate_reaction_ignore_case_var = tk.BooleanVar(value=True)
+        self.immediate_reaction_whole_word_var = tk.BooleanVar(value=False)
         self.openai_verification_var = tk.BooleanVar()
         self.openai_verification_checkbox = None
         self.openai_api_key_entry = None
         self.openai_key_container = None
+        self.load_shedding_var = tk.BooleanVar(value=True)
+        self.shedding_entries: Dict[str, ttk.Entry] = {}
 
         # Set initial window size
         window_width = 800
@@ -80,8 +88,12 @@ class ConfigManager:
         self.log_container = tk.Frame(self.container, background='black')
         self.log_text = scrolledtext.ScrolledText(self.log_container, wrap=tk.WORD, bg='black', fg='purple')
         self.log_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        stop_button = ttk.Button(self.log_container, text="Stop Bot", command=self.stop_bot)
-        stop_button.pack(pady=5)
+        log_buttons = tk.Frame(self.log_container, background='black')
+        log_buttons.pack(pady=5)
+        stop_button = ttk.Button(log_buttons, text="Stop Bot", command=self.stop_bot)
+        stop_button.pack(side='left', padx=5)
+        profile_button = ttk.Button(log_buttons, text="Capture Profile", command=self.capture_profile)
+        profile_button.pack(side='left', padx=5)
         
         # Basic Settings
         self.setup_basic_settings(self.main_container)
@@ -128,6 +140,20 @@ class ConfigManager:
         self.openai_api_key_entry = ttk.Entry(self.openai_key_container, show="*")  # Password field
         self.openai_api_key_entry.pack(fill='x', padx=5, pady=2)
 
+        # Load shedding thresholds, one row
+        shedding_frame = ttk.Frame(basic_frame)
+        shedding_frame.pack(fill='x', padx=0, pady=2)
+        ttk.Checkbutton(shedding_frame, text="Adaptive load shedding", variable=self.load_shedding_var).pack(side='left', padx=5)
+        for key, label in [
+            ('shed_rate_limit', "Rate (msg/s):"),
+            ('shed_queue_limit', "Queue:"),
+            ('shed_latency_limit', "Latency (s):"),
+            ('shed_sample_every', "Sample 1 in:")
+        ]:
+            ttk.Label(shedding_frame, text=label).pack(side='left', padx=(10, 2))
+            self.shedding_entries[key] = ttk.Entry(shedding_frame, width=6)
+            self.shedding_entries[key].pack(side='left')
+
     def toggle_openai_key_visibility(self):
         """Toggle visibility of OpenAI API key input based on checkbox state"""
         if not hasattr(self, 'openai_key_container') or self.openai_key_container is None:
@@ -158,15 +184,34 @@ class ConfigManager:
         canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
         canvas.configure(yscrollcommand=scrollbar.set)
 
-        # Immediate Reaction Message at the top
+        # Immediate Reaction Triggers at the top
         immediate_frame = ttk.Frame(scrollable_frame)
         immediate_frame.grid(row=0, column=0, columnspan=2, sticky='ew', padx=5, pady=(5,10))
         
-        ttk.Label(immediate_frame, text="Immediate Reaction Message", font=('Helvetica', 10, 'bold')).pack(anchor='w', padx=5)
-        self.immediate_reaction_entry = ttk.Entry(immediate_frame)
-        self.immediate_reaction_entry.insert(0, "@COVAS")  # Set default value
-        self.immediate_reaction_entry.pack(fill='x', padx=5, pady=2)
-        ttk.Label(immediate_frame, text="(Messages containing this text will trigger immediate reaction)", font=('Helvetica', 8)).pack(anchor='w', padx=5)
+        ttk.Label(immediate_frame, text="Immediate Reaction Triggers", font=('Helvetica', 10, 'bold')).pack(anchor='w', padx=5)
+        self.immediate_reaction_listbox = tk.Listbox(immediate_frame, height=4, exportselection=False)
+        self.immediate_reaction_listbox.pack(fill='x', padx=5, pady=2)
+        self.immediate_reaction_listbox.bind('<<ListboxSelect>>', self.on_immediate_reaction_select)
+        
+        # Editor row for the selected trigger
+        trigger_frame = ttk.Frame(immediate_frame)
+        trigger_frame.pack(fill='x', padx=5, pady=2)
+        
+        ttk.Label(trigger_frame, text="Text:").pack(side='left', padx=5)
+        self.immediate_reaction_entry = ttk.Entry(trigger_frame, width=20)
+        self.immediate_reaction_entry.pack(side='left', padx=5)
+        ttk.Checkbutton(trigger_frame, text="Ignore case", variable=self.immediate_reaction_ignore_case_var).pack(side='left', padx=5)
+        ttk.Checkbutton(trigger_frame, text="Whole word", variable=self.immediate_reaction_whole_word_var).pack(side='left', padx=5)
+        ttk.Label(trigger_frame, text="Prefix:").pack(side='left', padx=5)
+        self.immediate_reaction_prefix_entry = ttk.Entry(trigger_frame, width=30)
+        self.immediate_reaction_prefix_entry.pack(side='left', fill='x', expand=True, padx=5)
+        
+        trigger_buttons = ttk.Frame(immediate_frame)
+        trigger_buttons.pack(fill='x', padx=5, pady=2)
+        ttk.Button(trigger_buttons, text="Add", command=self.add_immediate_reaction).pack(side='left', padx=5)
+        ttk.Button(trigger_buttons, text="Update", command=self.update_immediate_reaction).pack(side='left', padx=5)
+        ttk.Button(trigger_buttons, text="Remove", command=self.remove_immediate_reaction).pack(side='left', padx=5)
+        ttk.Label(immediate_frame, text="(Messages containing any of these triggers will get an immediate reaction, {bot_name} is replaced by the bot name and the prefix is added in front of the instruction)", font=('Helvetica', 8), wraplength=700).pack(anchor='w', padx=5)
         
         # Add a separator
         separator = ttk.Separator(scrollable_frame, orient='horizontal')
@@ -227,8 +272,157 @@ class ConfigManager:
         button_frame.pack(fill='x', pady=5)
         
         ttk.Button(button_frame, text="Start Bot", command=self.start_bot, style='Visible.TButton').pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Test Patterns", command=self.open_test_bench, style='Visible.TButton').pack(side='left', padx=5)
         ttk.Button(button_frame, text="Reset to Defaults", command=self.reset_to_defaults, style='Visible.TButton').pack(side='right', padx=5)
 
+    def refresh_immediate_reactions(self):
+        """Redraw the trigger list from self.immediate_reactions"""
+        if self.immediate_reaction_listbox is None:
+            return
+        self.immediate_reaction_listbox.delete(0, tk.END)
+        for trigger in self.immediate_reactions:
+            options = []
+            if trigger.get('ignore_case', True):
+                options.append("ignore case")
+            if trigger.get('whole_word', False):
+                options.append("whole word")
+            if trigger.get('prefix'):
+                options.append(f"prefix: {trigger['prefix']}")
+            label = str(trigger.get('text', ''))
+            if options:
+                label += f"  ({', '.join(options)})"
+            self.immediate_reaction_listbox.insert(tk.END, label)
+
+    def clear_immediate_reaction_editor(self):
+        if self.immediate_reaction_entry:
+            self.immediate_reaction_entry.delete(0, tk.END)
+        if self.immediate_reaction_prefix_entry:
+            self.immediate_reaction_prefix_entry.delete(0, tk.END)
+        self.immediate_reaction_ignore_case_var.set(True)
+        self.immediate_reaction_whole_word_var.set(False)
+
+    def read_immediate_reaction_editor(self) -> Optional[Dict[str, Any]]:
+        """Build a trigger from the editor row, None if the text is empty"""
+        text = self.immediate_reaction_entry.get().strip() if self.immediate_reaction_entry else ''
+        if not text:
+            messagebox.showerror("Error", "Please enter the trigger text.")
+            return None
+        return {
+            "text": text,
+            "ignore_case": bool(self.immediate_reaction_ignore_case_var.get()),
+            "whole_word": bool(self.immediate_reaction_whole_word_var.get()),
+            "prefix": self.immediate_reaction_prefix_entry.get().strip() if self.immediate_reaction_prefix_entry else ''
+        }
+
+    def selected_immediate_reaction(self) -> Optional[int]:
+        if self.immediate_reaction_listbox is None:
+            return None
+        selection = self.immediate_reaction_listbox.curselection()
+        return selection[0] if selection else None
+
+    def on_immediate_reaction_select(self, event=None):
+        index = self.selected_immediate_reaction()
+        if index is None:
+            return
+        trigger = self.immediate_reactions[index]
+        self.clear_immediate_reaction_editor()
+        if self.immediate_reaction_entry:
+            self.immediate_reaction_entry.insert(0, str(trigger.get('text', '')))
+        if self.immediate_reaction_prefix_entry:
+            self.immediate_reaction_prefix_entry.insert(0, str(trigger.get('prefix', '')))
+        self.immediate_reaction_ignore_case_var.set(bool(trigger.get('ignore_case', True)))
+        self.immediate_reaction_whole_word_var.set(bool(trigger.get('whole_word', False)))
+
+    def add_immediate_reaction(self):
+        trigger = self.read_immediate_reaction_editor()
+        if trigger is None:
+            return
+        self.immediate_reactions.append(trigger)
+        self.refresh_immediate_reactions()
+        self.clear_immediate_reaction_editor()
+
+    def update_immediate_reaction(self):
+        index = self.selected_immediate_reaction()
+        if index is None:
+            messagebox.showerror("Error", "Please select a trigger to update.")
+            return
+        trigger = self.read_immediate_reaction_editor()
+        if trigger is None:
+            return
+        self.immediate_reactions[index] = trigger
+        self.refresh_immediate_reactions()
+
+    def remove_immediate_reaction(self):
+        index = self.selected_immediate_reaction()
+        if index is None:
+            return
+        del self.immediate_reactions[index]
+        self.refresh_immediate_reactions()
+        self.clear_immediate_reaction_editor()
+
+    def open_test_bench(self):
+        """Window that replays a saved chat log through the current patterns and instructions"""
+        window = tk.Toplevel(self.root)
+        window.title("Pattern Test Bench")
+        window.geometry("800x600")
+
+        controls = ttk.Frame(window, padding="5")
+        controls.pack(fill='x')
+        ttk.Label(controls, text="Chat Log:").pack(side='left', padx=5)
+        path_entry = ttk.Entry(controls)
+        path_entry.pack(side='left', fill='x', expand=True, padx=5)
+
+        def browse():
+            path = filedialog.askopenfilename(parent=window, title="Select Chat Log", filetypes=[("Log files", "*.log *.txt *.jsonl"), ("All files", "*.*")])
+            if path:
+                path_entry.delete(0, tk.END)
+                path_entry.insert(0, path)
+
+        all_users_var = tk.BooleanVar(value=False)
+        ttk.Button(controls, text="Browse...", command=browse).pack(side='left', padx=5)
+        ttk.Checkbutton(controls, text="Match all users", variable=all_users_var).pack(side='left', padx=5)
+
+        report_text = scrolledtext.ScrolledText(window, wrap=tk.WORD)
+        report_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        report_text.tag_configure("warning", foreground="red")
+
+        report_queue: queue.Queue[str] = queue.Queue()
+
+        def bench(path, config, all_users):
+            try:
+                messages = load_chat_log(path)
+                channel = str(config.get('channel', ''))
+                report_queue.put(format_report(run_bench(config, messages, channel, all_users), check_patterns(config, channel)))
+            except Exception as e:
+                report_queue.put(f"Error running test bench: {str(e)}")
+
+        def show_report():
+            try:
+                report = report_queue.get_nowait()
+            except queue.Empty:
+                window.after(100, show_report)
+                return
+            report_text.delete(1.0, tk.END)
+            for line in report.splitlines(keepends=False):
+                report_text.insert(tk.END, line + "\n", "warning" if "backtracks badly" in line else ())
+
+        def run():
+            path = path_entry.get().strip()
+            if not path:
+                messagebox.showerror("Error", "Please select a chat log file.", parent=window)
+                return
+            # Test what is currently in the form, saved or not
+            self.update_config_from_entries()
+            config = json.loads(json.dumps(self.config))
+            report_text.delete(1.0, tk.END)
+            report_text.insert(tk.END, "Running...\n")
+            thread = threading.Thread(target=bench, args=(path, config, bool(all_users_var.get())))
+            thread.daemon = True
+            thread.start()
+            window.after(100, show_report)
+
+        ttk.Button(controls, text="Run", command=run).pack(side='left', padx=5)
+
     def load_values(self):
         # Load basic settings
         if not isinstance(self.config, dict):
@@ -237,16 +431,18 @@ class ConfigManager:
         # Get values with proper type checking
         channel = str(self.config.get('channel', ''))
         bot_name = str(self.config.get('bot_name', ''))
-        immediate_reaction = str(self.config.get('immediate_reaction', '@COVAS'))  # Set default here too
         openai_verification = bool(self.config.get('openai_verification', False))
         openai_api_key = str(self.config.get('openai_api_key', ''))
 
         self.channel_entry.insert(0, channel)
         self.bot_name_entry.insert(0, bot_name)
-        if self.immediate_reaction_entry:
-            self.immediate_reaction_entry.delete(0, tk.END)  # Clear first
-            self.immediate_reaction_entry.insert(0, immediate_reaction)
+        self.immediate_reactions = [dict(trigger) for trigger in get_immediate_reactions(self.config)]
+        self.refresh_immediate_reactions()
         self.openai_verification_var.set(openai_verification)
+        self.load_shedding_var.set(bool(self.config.get('load_shedding', True)))
+        for key, entry in self.shedding_entries.items():
+            entry.delete(0, tk.END)
+            entry.insert(0, str(self.config.get(key, DEFAULT_CONFIG[key])))
         if self.openai_api_key_entry:
             self.openai_api_key_entry.insert(0, openai_api_key)
         
@@ -274,7 +470,7 @@ class ConfigManager:
             self.pattern_entries[event_key].insert(0, pattern_value)
             self.instruction_entries[event_key].insert(0, instruction_value)
 
-    def save_config(self):
+    def update_config_from_entries(self):
         # Ensure config is a dictionary
         if not isinstance(self.config, dict):
             self.config = DEFAULT_CONFIG.copy()
@@ -284,8 +480,16 @@ class ConfigManager:
         self.config['bot_name'] = self.bot_name_entry.get()
         self.config['openai_verification'] = bool(self.openai_verification_var.get())
         self.config['openai_api_key'] = self.openai_api_key_entry.get() if self.openai_api_key_entry else ''
-        if self.immediate_reaction_entry is not None:
-            self.config['immediate_reaction'] = self.immediate_reaction_entry.get()
+        self.config['immediate_reactions'] = [dict(trigger) for trigger in self.immediate_reactions]
+        self.config.pop('immediate_reaction', None)
+        self.config['load_shedding'] = bool(self.load_shedding_var.get())
+        for key, entry in self.shedding_entries.items():
+            # Keep the previous value if the entry is not a valid number
+            try:
+                value = float(entry.get())
+                self.config[key] = int(value) if key in ('shed_queue_limit', 'shed_sample_every') else value
+            except ValueError:
+                pass
         
         # Initialize sections if they don't exist
         if 'patterns' not in self.config or not isinstance(self.config['patterns'], dict):
@@ -300,6 +504,9 @@ class ConfigManager:
         for event_key in self.pattern_entries:
             patterns[event_key] = self.pattern_entries[event_key].get()
             instructions[event_key] = self.instruction_entries[event_key].get()
+
+    def save_config(self):
+        self.update_config_from_entries()
         
         # Save to file
         try:
@@ -314,8 +521,7 @@ class ConfigManager:
             # Clear and reload all fields
             self.channel_entry.delete(0, tk.END)
             self.bot_name_entry.delete(0, tk.END)
-            if self.immediate_reaction_entry:
-                self.immediate_reaction_entry.delete(0, tk.END)
+            self.clear_immediate_reaction_editor()
             
             for entry in self.pattern_entries.values():
                 entry.delete(0, tk.END)
@@ -357,8 +563,6 @@ class ConfigManager:
         # Update config with current values before saving
         self.config['channel'] = channel
         self.config['bot_name'] = bot_name
-        if self.immediate_reaction_entry is not None:
-            self.config['immediate_reaction'] = self.immediate_reaction_entry.get()
         
         # Auto-save configuration before starting
         self.save_config()
@@ -419,7 +623,8 @@ class ConfigManager:
                 '--bot-name',
                 bot_name,
                 '--patterns',
-                config_str
+                config_str,
+                '--control-stdin'
             ])
 
             # Add OpenAI settings if enabled
@@ -432,6 +637,7 @@ class ConfigManager:
             # Start bot process
             self.bot_process = subprocess.Popen(
                 cmd,
+                stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 universal_newlines=True,
@@ -454,6 +660,18 @@ class ConfigManager:
                 self.log_text.see(tk.END)
             self.stop_bot()
 
+    def capture_profile(self):
+        """Ask the running bot to capture a profile, the bot logs where it was written"""
+        if not self.bot_process or self.bot_process.poll() is not None or self.bot_process.stdin is None:
+            return
+        try:
+            self.bot_process.stdin.write("profile 60\n")
+            self.bot_process.stdin.flush()
+        except (OSError, ValueError) as e:
+            if self.log_text is not None:
+                self.log_text.insert(tk.END, f"Error requesting profile: {str(e)}\n")
+                self.log_text.see(tk.END)
+
     def update_log(self):
         """Update log with bot output"""
         try:
@@ -0,0 +1,249 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from twitch import load_or_create_config, run_bot, log
+from profiler import BotProfiler
+
+# Headless entry point: runs the bot straight from covas_twitch_config.json without tkinter or PIL.
+# Control is available on stdin (start/stop/status/profile/quit) and optionally over a local HTTP port.
+
+class BotController:
+    """Run the bot in a background thread and expose start/stop/status"""
+
+    def __init__(self, config_path, profiler, restart_delay=0):
+        self.config_path = config_path
+        self.profiler = profiler
+        # Seconds to wait before restarting a bot whose connection dropped, 0 leaves it stopped
+        self.restart_delay = restart_delay
+        self.restart_at = None
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.quit_event = threading.Event()
+        self.stats = {}
+        self.channel = ''
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        with self.lock:
+            if self.is_running():
+                return False, "Bot is already running"
+
+            # Re-read the config on every start so edits to the file take effect
+            config = load_or_create_config(self.config_path)
+            channel = str(config.get('channel', '')).strip()
+            bot_name = str(config.get('bot_name', '')).strip()
+            if not channel or not bot_name:
+                return False, f"Please set both channel and bot_name in {self.config_path}"
+
+            log("=== Starting COVAS:NEXT Twitch Integration (headless) ===")
+            log(f"Channel: {channel}")
+            log(f"Bot Name: {bot_name}")
+            log(f"OpenAI Verification: {'Enabled' if config.get('openai_verification', False) else 'Disabled'}")
+            log(f"OpenAI API Key: {'Configured' if config.get('openai_api_key') else 'Not Configured'}")
+            log("=== Configuration Complete ===")
+
+            self.channel = channel
+            self.restart_at = None
+            self.stats = {}
+            self.stop_event = threading.Event()
+            self.thread = threading.Thread(
+                target=run_bot,
+                args=(config, channel),
+                kwargs={'stop_event': self.stop_event, 'stats': self.stats, 'profiler': self.profiler}
+            )
+            self.thread.daemon = True
+            self.thread.start()
+            return True, "Bot started"
+
+    def stop(self):
+        with self.lock:
+            if not self.is_running():
+                if self.restart_at is not None:
+                    self.restart_at = None
+                    return True, "Restart cancelled"
+                return False, "Bot is not running"
+            self.stop_event.set()
+            self.thread.join(timeout=5.0)
+            if self.thread.is_alive():
+                return False, "Bot did not stop within 5 seconds"
+            return True, "Bot stopped"
+
+    def watch(self, now):
+        """Notice a bot that stopped without being asked to and restart it if configured, call this regularly"""
+        with self.lock:
+            if self.thread is not None and not self.is_running() and not self.stop_event.is_set():
+                # Mark the exit as handled so it is only reported once
+                self.stop_event.set()
+                if self.restart_delay > 0:
+                    log(f"Bot stopped unexpectedly, the connection to Twitch was lost. Restarting in {self.restart_delay:g} seconds")
+                    self.restart_at = now + self.restart_delay
+                else:
+                    log("Bot stopped unexpectedly, the connection to Twitch was lost. Send start to reconnect, "
+                        "or run with --restart-delay to reconnect automatically")
+            restart = self.restart_at is not None and now >= self.restart_at
+        if restart:
+            ok, message = self.start()
+            if not ok:
+                log(f"Error: {message}")
+
+    def status(self):
+        running = self.is_running()
+        status = {
+            'running': running,
+            'channel': self.channel,
+            'profiling': self.profiler.is_running()
+        }
+        if self.restart_at is not None:
+            status['restart_in'] = round(max(0.0, self.restart_at - time.time()), 1)
+        stats = dict(self.stats)
+        if stats:
+            status['connected'] = stats.get('connected', False)
+            if running:
+                status['uptime'] = round(time.time() - stats.get('started_at', time.time()), 1)
+            status['messages'] = stats.get('messages', 0)
+            status['instructions'] = stats.get('instructions', 0)
+            if 'bytes_raw' in stats:
+                status['bytes_published'] = stats['bytes_published']
+                status['bytes_saved_percent'] = round(100.0 * (stats['bytes_raw'] - stats['bytes_published']) / stats['bytes_raw'], 1) if stats['bytes_raw'] else 0.0
+            if 'load_level' in stats:
+                status['load_level'] = stats['load_level']
+                status['level_changes'] = dict(stats.get('level_changes', {}))
+                status['shed'] = dict(stats.get('shed', {}))
+        return status
+
+    def quit(self):
+        if self.is_running():
+            self.stop()
+        self.quit_event.set()
+
+    def handle_command(self, command):
+        """Run a control command and return a JSON-serializable result"""
+        command, _, argument = command.strip().lower().partition(' ')
+        if command == 'start':
+            ok, message = self.start()
+        elif command == 'stop':
+            ok, message = self.stop()
+        elif command == 'status':
+            return {'ok': True, 'status': self.status()}
+        elif command == 'profile':
+            try:
+                duration = float(argument) if argument else 60
+            except ValueError:
+                return {'ok': False, 'message': f"Invalid profile duration: {argument}"}
+            if not self.is_running():
+                ok, message = False, "Bot is not running"
+            elif self.profiler.request(duration):
+                ok, message = True, f"Profile capture requested for {duration:g} seconds"
+            else:
+                ok, message = False, "A capture is already running"
+        elif command == 'quit':
+            self.quit()
+            ok, message = True, "Shutting down"
+        else:
+            ok, message = False, f"Unknown command: {command}"
+        return {'ok': ok, 'message': message}
+
+def make_http_handler(controller):
+    class ControlHandler(BaseHTTPRequestHandler):
+        def _reply(self, code, result):
+            body = json.dumps(result).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/status':
+                self._reply(200, controller.handle_command('status'))
+            else:
+                self._reply(404, {'ok': False, 'message': 'Not found'})
+
+        def do_POST(self):
+            command = self.path.strip('/')
+            if command in ('start', 'stop', 'profile', 'quit'):
+                result = controller.handle_command(command)
+                self._reply(200 if result['ok'] else 409, result)
+            else:
+                self._reply(404, {'ok': False, 'message': 'Not found'})
+
+        def log_message(self, format, *args):
+            # Keep the bot log free of HTTP access lines
+            pass
+
+    return ControlHandler
+
+def read_stdin_commands(controller):
+    """Read control commands from stdin, one per line"""
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        print(json.dumps(controller.handle_command(line)), flush=True)
+        if controller.quit_event.is_set():
+            return
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='COVAS:NEXT Twitch Integration - Headless Mode')
+    parser.add_argument('--config', default='covas_twitch_config.json', help='Path to the configuration file')
+    parser.add_argument('--http-port', type=int, default=0, help='Serve start/stop/status on 127.0.0.1:PORT (disabled if 0)')
+    parser.add_argument('--no-stdin', action='store_true', help='Do not read control commands from stdin')
+    parser.add_argument('--no-autostart', action='store_true', help='Wait for a start command instead of starting immediately')
+    parser.add_argument('--restart-delay', type=float, default=0, help='Restart the bot this many seconds after its connection drops (disabled if 0)')
+    parser.add_argument('--profile-mode', choices=['sampling', 'cprofile'], default='sampling', help='Sample all threads into collapsed stacks, or run cProfile on the read loop and moderation workers')
+    parser.add_argument('--profile-dir', default='profiles', help='Directory profile captures are written to')
+    parser.add_argument('--profile-memory', action='store_true', help='Also trace allocations during captures (slows the bot down while capturing)')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    controller = BotController(args.config, BotProfiler(args.profile_dir, args.profile_mode, memory=args.profile_memory, log=log),
+                               args.restart_delay)
+
+    server = None
+    if args.http_port:
+        try:
+            server = ThreadingHTTPServer(('127.0.0.1', args.http_port), make_http_handler(controller))
+        except OSError as e:
+            log(f"Error starting control server: {str(e)}")
+            sys.exit(1)
+        server_thread = threading.Thread(target=server.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+        log(f"Control server listening on http://127.0.0.1:{args.http_port}")
+
+    if not args.no_autostart:
+        ok, message = controller.start()
+        if not ok:
+            log(f"Error: {message}")
+
+    # stdin is read on its own thread so a quit over HTTP does not wait for the next input line
+    stdin_thread = None
+    if not args.no_stdin and sys.stdin is not None:
+        stdin_thread = threading.Thread(target=read_stdin_commands, args=(controller,))
+        stdin_thread.daemon = True
+        stdin_thread.start()
+
+    try:
+        # Once stdin is closed or disabled, keep serving HTTP until asked to quit,
+        # otherwise there is nothing left to control and we exit with the bot
+        while not controller.quit_event.is_set():
+            controller.watch(time.time())
+            stdin_open = stdin_thread is not None and stdin_thread.is_alive()
+            if server is None and not stdin_open and not controller.is_running() and controller.restart_at is None:
+                break
+            controller.quit_event.wait(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controller.quit()
+        if server is not None:
+            server.shutdown()
+
+if __name__ == "__main__":
+    main()
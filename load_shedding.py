@@ -0,0 +1,119 @@
+from collections import Counter
+
+# Degradation levels, each one includes the ones before it
+LEVEL_FULL = 0         # Moderate everything
+LEVEL_PRIORITY = 1     # Moderate only immediate reactions and event messages
+LEVEL_SAMPLE = 2       # Also only keep a sample of background chat
+LEVEL_DROP = 3         # Drop background chat entirely
+
+LEVEL_NAMES = ['full moderation', 'priority moderation', 'sample chat', 'drop chat']
+
+class LoadShedder:
+    """
+    Pick a degradation level from input rate, moderation queue depth and moderation latency.
+    Each signal is divided by its limit, the largest ratio is the pressure. A pressure of 1, 2 or 3
+    raises the level to 1, 2 or 3 immediately. The level only drops one step at a time, once the
+    pressure stayed below `hysteresis` times the current level's threshold for `cooldown` seconds.
+    Latency halves every `latency_half_life` seconds without a new moderation call, since shedding
+    itself stops most of the calls that would otherwise bring it back down.
+    """
+
+    def __init__(self, rate_limit=10.0, queue_limit=16, latency_limit=1.0, sample_every=4,
+                 cooldown=10.0, hysteresis=0.7, latency_half_life=5.0, log=print):
+        self.rate_limit = rate_limit
+        self.queue_limit = queue_limit
+        self.latency_limit = latency_limit
+        self.sample_every = max(1, int(sample_every))
+        self.cooldown = cooldown
+        self.hysteresis = hysteresis
+        self.latency_half_life = latency_half_life
+        self.log = log
+
+        self.level = LEVEL_FULL
+        self.pressure = 0.0
+        self.rate = 0.0
+        self.queue_depth = 0
+        self.latency = 0.0
+        self.latency_updated = None
+        self.level_changes = Counter()
+        self.shed = Counter()
+
+        self.window_start = None
+        self.window_count = 0
+        self.below_since = None
+        self.sample_counter = 0
+
+    def record_message(self, now):
+        """Count an incoming chat message for the input rate"""
+        if self.window_start is None:
+            self.window_start = now
+        self.window_count += 1
+
+    def record_latency(self, seconds, now):
+        """Feed the duration of a moderation call, smoothed so one slow call does not flip the level"""
+        self.latency = 0.8 * self.latency + 0.2 * seconds
+        self.latency_updated = now
+
+    def decay_latency(self, now):
+        """Age the latency towards zero while no moderation calls finish"""
+        if self.latency_updated is None or now - self.latency_updated < 1.0:
+            return
+        if self.latency_half_life:
+            self.latency *= 0.5 ** ((now - self.latency_updated) / self.latency_half_life)
+        self.latency_updated = now
+
+    def update(self, now, queue_depth=0):
+        """Re-evaluate the level, call this regularly from the read loop"""
+        self.queue_depth = queue_depth
+        self.decay_latency(now)
+        if self.window_start is not None and now - self.window_start >= 1.0:
+            rate = self.window_count / (now - self.window_start)
+            self.rate = rate if self.rate == 0.0 else 0.5 * self.rate + 0.5 * rate
+            self.window_start = now
+            self.window_count = 0
+
+        ratios = [0.0]
+        if self.rate_limit:
+            ratios.append(self.rate / self.rate_limit)
+        if self.queue_limit:
+            ratios.append(self.queue_depth / self.queue_limit)
+        if self.latency_limit:
+            ratios.append(self.latency / self.latency_limit)
+        self.pressure = max(ratios)
+
+        target = min(LEVEL_DROP, int(self.pressure))
+        if target > self.level:
+            self.set_level(target)
+            self.below_since = None
+        elif self.level > LEVEL_FULL and self.pressure < self.level * self.hysteresis:
+            if self.below_since is None:
+                self.below_since = now
+            elif now - self.below_since >= self.cooldown:
+                self.set_level(self.level - 1)
+                self.below_since = now
+        else:
+            self.below_since = None
+
+    def set_level(self, level):
+        self.log(f"LOAD - {LEVEL_NAMES[self.level]} -> {LEVEL_NAMES[level]} "
+                 f"(rate {self.rate:.1f}/s, queue {self.queue_depth}, moderation latency {self.latency:.2f}s)")
+        self.level_changes[f"{self.level}->{level}"] += 1
+        self.level = level
+
+    def route(self, priority):
+        """
+        Decide what to do with a message at the current level.
+        Returns (keep, moderate), priority messages are always kept and moderated.
+        """
+        if priority or self.level == LEVEL_FULL:
+            return True, True
+        if self.level == LEVEL_DROP:
+            self.shed['dropped'] += 1
+            return False, False
+        if self.level == LEVEL_SAMPLE:
+            self.sample_counter += 1
+            if self.sample_counter % self.sample_every:
+                self.shed['sampled_out'] += 1
+                return False, False
+        self.shed['unmoderated'] += 1
+        return True, False
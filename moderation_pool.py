@@ -0,0 +1,57 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+# Result handed back for messages that passed without a check, compare with `is`
+UNMODERATED = (False, {})
+
+class ModerationPool:
+    """
+    Run moderation checks on a thread pool while keeping message order.
+    Results are released in submission order, and no more than max_in_flight
+    messages are held at a time so memory stays bounded when the API slows down.
+    """
+
+    def __init__(self, moderate, workers=4, max_in_flight=32):
+        self.moderate = moderate
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix='moderation')
+        self.pending = deque()
+
+    def is_full(self):
+        return len(self.pending) >= self.max_in_flight
+
+    def submit(self, item, text, moderate=True):
+        """
+        Queue text for moderation, item is handed back with the result.
+        With moderate=False the message passes unchecked but still keeps its place in the order.
+        """
+        if moderate:
+            future = self.executor.submit(self.moderate, text)
+        else:
+            future = Future()
+            future.set_result(UNMODERATED)
+        self.pending.append((item, future))
+
+    def completed(self):
+        """
+        Yield (item, result) for finished checks in submission order.
+        Stops at the first unfinished check, unless the pool is full, then it waits for
+        the oldest one so the caller is slowed down instead of memory growing.
+        """
+        while self.pending:
+            item, future = self.pending[0]
+            if not future.done():
+                if not self.is_full():
+                    break
+                wait([future])
+            self.pending.popleft()
+            try:
+                result = future.result()
+            except Exception:
+                # Same fallback as a failed API call: let the message through
+                result = (False, {})
+            yield item, result
+
+    def close(self):
+        self.pending.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,253 @@
+import argparse
+import json
+import math
+import re
+import sys
+import time
+from twitch import (PRIVMSG_RE, parse_irc_tags, load_or_create_config, create_event_matchers, create_reaction_matcher,
+                    match_immediate_reaction, format_instruction, log)
+
+# Offline test bench: replays a saved chat log through the configured event patterns and
+# instruction templates, and probes the patterns for catastrophic backtracking.
+
+# Longest chat message Twitch allows, the backtracking probe does not need to go further
+MAX_MESSAGE_LENGTH = 500
+# A single match slower than this (in seconds) on a probe string is flagged
+SLOW_MATCH_SECONDS = 0.01
+# Flag patterns whose match time grows faster than length ** MAX_GROWTH
+MAX_GROWTH = 2.5
+# Growth is only trusted once the largest probe takes at least this long, faster timings are mostly noise
+MIN_GROWTH_SECONDS = 0.001
+# Each probe size is timed this many times and the median is used
+PROBE_REPEATS = 5
+
+LOG_LINE_RE = re.compile(r"^(?:CHAT|IMMEDIATE REACTION) - ([^:\s]+): (.*)$")
+SIMPLE_LINE_RE = re.compile(r"^(?:\[[^\]]*\]\s*)?<?([\w]+)>?:\s(.*)$")
+
+def parse_chat_line(line):
+    """
+    Return (username, message) for a line of a saved chat log, or None.
+    Understands raw IRC lines, the bot's own log output, "user: message" lines
+    (optionally with a [timestamp] in front) and JSON lines with user/username and message/text.
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    if line.startswith('{'):
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(entry, dict):
+            return None
+        username = entry.get('username', entry.get('user'))
+        message = entry.get('message', entry.get('text'))
+        if username is None or message is None:
+            return None
+        return str(username), str(message)
+
+    _, line = parse_irc_tags(line)
+    for regex in (PRIVMSG_RE, LOG_LINE_RE, SIMPLE_LINE_RE):
+        match = regex.search(line)
+        if match:
+            return match.group(1), match.group(2)
+    return None
+
+def load_chat_log(path):
+    """Read a chat log file into a list of (username, message) tuples"""
+    messages = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            parsed = parse_chat_line(line)
+            if parsed is not None:
+                messages.append(parsed)
+    return messages
+
+def time_match(regex, probe):
+    """Median seconds per match over PROBE_REPEATS timed batches"""
+    timings = []
+    for _ in range(PROBE_REPEATS):
+        runs = 0
+        started = time.perf_counter()
+        while True:
+            regex.match(probe)
+            runs += 1
+            elapsed = time.perf_counter() - started
+            if elapsed > 0.002:
+                break
+        # Already too slow, repeating it only makes the bench hang longer
+        if elapsed / runs > SLOW_MATCH_SECONDS:
+            return elapsed / runs
+        timings.append(elapsed / runs)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def fit_growth(points):
+    """Least squares slope of log(seconds) over log(length), the k in seconds ~ length^k"""
+    xs = [math.log(length) for length, _ in points]
+    ys = [math.log(seconds) for _, seconds in points]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    if not spread:
+        return 1.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread
+
+def probe_backtracking(regex, template):
+    """
+    Time the pattern on growing strings built from its own literal text, which is what
+    makes lazy groups try every split. Returns (seconds, length, growth) for the largest probe,
+    growth is fitted over all probe sizes.
+    """
+    literals = ''.join(re.split(r'\{\w+\}', template)) + '1'
+    points = []
+    repeat = 1
+    while True:
+        filler = literals * repeat
+        # Two newlines can never satisfy the trailing $, so the engine has to give up the hard way
+        probe = re.sub(r'\{\w+\}', lambda m: filler, template) + '\n\n'
+
+        # Without placeholders the probe never grows, there is nothing to backtrack over
+        if points and len(probe) <= points[-1][0]:
+            break
+        points.append((len(probe), time_match(regex, probe)))
+        if points[-1][1] > SLOW_MATCH_SECONDS or len(probe) >= MAX_MESSAGE_LENGTH:
+            break
+        repeat *= 2
+
+    length, seconds = points[-1]
+    growth = fit_growth(points) if len(points) > 1 else 1.0
+    return seconds, length, growth
+
+def check_patterns(config, channel_name=''):
+    """Return a list of warnings for patterns that are slow or backtrack catastrophically"""
+    warnings = []
+    patterns = config.get('patterns', {})
+    for event_key, regex, _ in create_event_matchers(config, channel_name):
+        if not regex.groups:
+            warnings.append(
+                f"{event_key}: pattern '{patterns.get(event_key, '')}' has no placeholders, "
+                f"the bot cannot fill the instruction for it. Add at least {{user}}."
+            )
+            continue
+        seconds, length, growth = probe_backtracking(regex, patterns.get(event_key, ''))
+        if seconds > SLOW_MATCH_SECONDS or (growth > MAX_GROWTH and seconds >= MIN_GROWTH_SECONDS):
+            warnings.append(
+                f"{event_key}: pattern '{patterns.get(event_key, '')}' backtracks badly, "
+                f"{seconds * 1000:.1f} ms on a {length} character message (time grows ~length^{growth:.1f}). "
+                f"Put more fixed text between placeholders."
+            )
+    return warnings
+
+def run_bench(config, messages, channel_name='', all_users=False):
+    """
+    Run messages through the immediate reaction triggers, event patterns and instruction templates.
+    Only messages from the bot and the channel are matched against patterns, like the live bot does,
+    unless all_users is set.
+    """
+    event_matchers = create_event_matchers(config, channel_name)
+    reaction_matcher = create_reaction_matcher(config)
+    event_sources = {str(config.get('bot_name', '')).lower(), channel_name.lower().lstrip('#')}
+
+    results = {
+        'messages': len(messages),
+        'matched': {event_key: 0 for event_key, _, _ in event_matchers},
+        'immediate_reactions': 0,
+        'unmatched': [],
+        'instructions': [],
+        'errors': [],
+        'seconds': 0.0
+    }
+
+    started = time.perf_counter()
+    for username, message in messages:
+        if match_immediate_reaction(reaction_matcher, message) is not None:
+            results['immediate_reactions'] += 1
+
+        if not all_users and username.lower() not in event_sources:
+            continue
+
+        for event_key, pattern, formatter in event_matchers:
+            match = pattern.match(message)
+            if not match:
+                continue
+            results['matched'][event_key] += 1
+            try:
+                _, groups = formatter(match)
+                instruction = format_instruction(config['instructions'][event_key], event_key, groups, channel_name)
+                results['instructions'].append((event_key, message, instruction))
+            except (KeyError, IndexError, ValueError) as e:
+                results['errors'].append(f"{event_key}: failed to format instruction for '{message}': {str(e)}")
+            break
+        else:
+            results['unmatched'].append((username, message))
+    results['seconds'] = time.perf_counter() - started
+    return results
+
+def format_report(results, warnings, max_lines=50):
+    """Human readable bench report, used by the command line and the GUI"""
+    lines = []
+    if warnings:
+        lines.append("=== Pattern Warnings ===")
+        lines.extend(warnings)
+        lines.append("")
+
+    rate = results['messages'] / results['seconds'] if results['seconds'] > 0 else 0.0
+    lines.append("=== Summary ===")
+    lines.append(f"Messages: {results['messages']} in {results['seconds'] * 1000:.1f} ms ({rate:,.0f} messages/second)")
+    lines.append(f"Immediate reactions: {results['immediate_reactions']}")
+    lines.append("")
+
+    lines.append("=== Matches per Event ===")
+    for event_key, count in results['matched'].items():
+        lines.append(f"{event_key}: {count}")
+    lines.append("")
+
+    if results['errors']:
+        lines.append("=== Instruction Errors ===")
+        lines.extend(results['errors'][:max_lines])
+        lines.append("")
+
+    lines.append(f"=== Unmatched Alert Lines ({len(results['unmatched'])}) ===")
+    for username, message in results['unmatched'][:max_lines]:
+        lines.append(f"{username}: {message}")
+    if len(results['unmatched']) > max_lines:
+        lines.append(f"... and {len(results['unmatched']) - max_lines} more")
+    lines.append("")
+
+    lines.append(f"=== Rendered Instructions ({len(results['instructions'])}) ===")
+    for event_key, message, instruction in results['instructions'][:max_lines]:
+        lines.append(f"[{event_key}] {message}")
+        lines.append(f"    -> {instruction}")
+    if len(results['instructions']) > max_lines:
+        lines.append(f"... and {len(results['instructions']) - max_lines} more")
+    return '\n'.join(lines)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='COVAS:NEXT Twitch Integration - Offline Pattern Test Bench')
+    parser.add_argument('chat_log', help='Saved chat log: raw IRC, bot log output, "user: message" or JSON lines')
+    parser.add_argument('--config', default='covas_twitch_config.json', help='Path to the configuration file')
+    parser.add_argument('--channel', help='Channel name (default: from the configuration)')
+    parser.add_argument('--all-users', action='store_true', help='Match patterns against every user, not only the bot and the channel')
+    parser.add_argument('--max-lines', type=int, default=50, help='Maximum number of lines listed per section')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    config = load_or_create_config(args.config)
+    channel = args.channel if args.channel is not None else str(config.get('channel', ''))
+
+    try:
+        messages = load_chat_log(args.chat_log)
+    except IOError as e:
+        log(f"Error reading chat log: {str(e)}")
+        sys.exit(1)
+
+    warnings = check_patterns(config, channel)
+    results = run_bench(config, messages, channel, args.all_users)
+    log(format_report(results, warnings, args.max_lines))
+    if warnings:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
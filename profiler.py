@@ -0,0 +1,163 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+class BotProfiler:
+    """
+    Bounded profile captures of the running bot.
+    Captures can be requested from any thread, the read loop starts and stops them in poll().
+
+    sampling: samples the stacks of all threads (read loop, moderation workers) and writes collapsed
+              stacks, one "thread;frame;frame count" line per stack, ready for flamegraph tools
+    cprofile: runs cProfile in the read loop thread, and in other threads for functions passed
+              through wrap() such as the moderation check, and writes one merged pstats file
+    With memory=True both modes also write the top allocations from tracemalloc snapshots taken
+    at start and end. Tracing every allocation slows the bot down, which skews the CPU profile,
+    so it is off by default.
+    """
+
+    def __init__(self, output_dir='profiles', mode='sampling', interval=0.005, memory=False, log=print):
+        self.output_dir = output_dir
+        self.mode = mode
+        self.interval = interval
+        self.memory = memory
+        self.log = log
+        self.lock = threading.Lock()
+        self.requested = None
+        self.ends_at = None
+        self.name = ''
+        self.profile = None
+        self.thread_profiles = []
+        self.samples = Counter()
+        self.sampler = None
+        self.stop_sampling = threading.Event()
+        self.memory_start = None
+        self.started_tracing = False
+
+    def request(self, duration=60):
+        """Ask for a capture of duration seconds, returns False if one is already running"""
+        with self.lock:
+            if self.ends_at is not None:
+                return False
+            self.requested = float(duration)
+            return True
+
+    def is_running(self):
+        return self.ends_at is not None
+
+    def poll(self):
+        """Start a requested capture or finish an expired one, call this regularly from the read loop"""
+        with self.lock:
+            duration, self.requested = self.requested, None
+        if duration is not None and self.ends_at is None:
+            self._start(duration)
+        elif self.ends_at is not None and time.time() >= self.ends_at:
+            self._stop()
+
+    def wrap(self, function):
+        """Return function so its calls on other threads are included in cProfile captures"""
+        def profiled(*args, **kwargs):
+            if self.profile is None:
+                return function(*args, **kwargs)
+            # A profile per call, a profile can only be enabled in the thread it is running in
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(function, *args, **kwargs)
+            finally:
+                with self.lock:
+                    if self.profile is not None:
+                        self.thread_profiles.append(profile)
+        return profiled
+
+    def close(self):
+        if self.ends_at is not None:
+            self._stop()
+
+    def _start(self, duration):
+        self.name = time.strftime("profile-%Y%m%d-%H%M%S")
+        self.ends_at = time.time() + duration
+
+        if self.memory:
+            # Leave tracing alone when something else already started it
+            self.started_tracing = not tracemalloc.is_tracing()
+            if self.started_tracing:
+                tracemalloc.start(10)
+            self.memory_start = tracemalloc.take_snapshot()
+
+        if self.mode == 'cprofile':
+            self.thread_profiles = []
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            self.samples = Counter()
+            self.stop_sampling = threading.Event()
+            self.sampler = threading.Thread(target=self._sample, name='profiler')
+            self.sampler.daemon = True
+            self.sampler.start()
+
+        self.log(f"PROFILE - Capturing {self.mode} profile for {duration:g} seconds")
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self.stop_sampling.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def _stop(self):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, self.name)
+
+            if self.profile is not None:
+                self.profile.disable()
+                with self.lock:
+                    thread_profiles, self.thread_profiles = self.thread_profiles, []
+                    profile, self.profile = self.profile, None
+                stats = pstats.Stats(profile)
+                for thread_profile in thread_profiles:
+                    stats.add(thread_profile)
+                stats.dump_stats(f"{base}.pstats")
+                self.log(f"PROFILE - Wrote {base}.pstats ({len(thread_profiles)} calls from other threads)")
+            if self.sampler is not None:
+                self.stop_sampling.set()
+                self.sampler.join(timeout=1.0)
+                with open(f"{base}.collapsed", 'w', encoding='utf-8') as f:
+                    for stack, count in self.samples.most_common():
+                        f.write(f"{stack} {count}\n")
+                self.log(f"PROFILE - Wrote {base}.collapsed ({sum(self.samples.values())} samples)")
+
+            if self.memory_start is None:
+                return
+            memory_end = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            with open(f"{base}-memory.txt", 'w', encoding='utf-8') as f:
+                f.write(f"Traced memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB\n")
+                f.write("Allocation tracing was on during this capture, so its CPU timings are higher than normal.\n\n")
+                f.write("Top allocation changes during the capture:\n")
+                for stat in memory_end.compare_to(self.memory_start, 'lineno')[:25]:
+                    f.write(f"{stat}\n")
+            self.log(f"PROFILE - Wrote {base}-memory.txt")
+        except Exception as e:
+            self.log(f"PROFILE - Failed to write profile: {str(e)}")
+        finally:
+            if self.started_tracing:
+                tracemalloc.stop()
+                self.started_tracing = False
+            self.profile = None
+            self.sampler = None
+            self.memory_start = None
+            self.ends_at = None
@@ -0,0 +1,284 @@
+import argparse
+import multiprocessing
+import multiprocessing.connection
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from twitch import load_or_create_config, run_bot, log
+from EDMesg.CovasNext import create_covasnext_client
+
+# Supervisor mode: spreads channels over worker processes so IRC parsing, moderation and
+# pattern matching use more than one core. Each worker sends its notifications back over its
+# own pipe to this process, which owns the only COVAS:NEXT client. A worker that has to be
+# killed can only break its own pipe, which is thrown away when the worker is restarted.
+
+HEARTBEAT_INTERVAL = 5
+RECONNECT_DELAY = 5
+# Stats that add up over the lifetime of the supervisor, run_bot starts them at 0 on every connect
+COUNTERS = ('messages', 'instructions', 'bytes_raw', 'bytes_published')
+
+class PipePublisher:
+    """Stands in for the COVAS:NEXT client inside a worker and forwards events to the supervisor"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        # Every channel thread of the worker sends on the same pipe
+        self.lock = threading.Lock()
+
+    def send(self, kind, payload):
+        with self.lock:
+            self.connection.send((kind, payload))
+
+    def publish(self, event):
+        self.send('publish', event)
+
+    def close(self):
+        pass
+
+def get_channels(config):
+    """Channels to follow, from the 'channels' list or a comma separated 'channel' value"""
+    channels = config.get('channels')
+    if not isinstance(channels, list) or not channels:
+        channels = re.split(r'[,\s]+', str(config.get('channel', '')))
+    return [str(channel).strip().lstrip('#') for channel in channels if str(channel).strip()]
+
+def run_worker(worker_id, channels, config, connection):
+    """Worker process: one connection per channel, reconnecting channels whose connection dropped"""
+    publisher = PipePublisher(connection)
+    stop_event = threading.Event()
+    stats = {channel: {} for channel in channels}
+    # Counters of connections that already ended, so a reconnect does not reset the totals
+    totals = {channel: Counter() for channel in channels}
+    threads = {}
+
+    try:
+        while not stop_event.is_set():
+            for channel in channels:
+                thread = threads.get(channel)
+                if thread is not None and thread.is_alive():
+                    continue
+                if thread is not None:
+                    log(f"Worker {worker_id}: connection to {channel} ended, reconnecting")
+                    totals[channel].update({key: stats[channel].get(key, 0) for key in COUNTERS})
+                    stats[channel] = {}
+                thread = threading.Thread(
+                    target=run_bot,
+                    args=(config, channel),
+                    kwargs={'stop_event': stop_event, 'stats': stats[channel], 'covasnext_client': publisher},
+                    name=f"channel-{channel}"
+                )
+                thread.daemon = True
+                thread.start()
+                threads[channel] = thread
+
+            # The heartbeat doubles as the metrics report
+            report = {}
+            for channel, channel_stats in stats.items():
+                report[channel] = dict(channel_stats)
+                for key in COUNTERS:
+                    report[channel][key] = totals[channel][key] + channel_stats.get(key, 0)
+            publisher.send('stats', report)
+            # The only command the supervisor sends is stop, a closed pipe means it is gone
+            if connection.poll(HEARTBEAT_INTERVAL):
+                stop_event.set()
+    except (KeyboardInterrupt, OSError, EOFError):
+        stop_event.set()
+
+    for thread in threads.values():
+        thread.join(timeout=2.0)
+
+class Supervisor:
+    """Start, watch and restart worker processes and publish what they send"""
+
+    def __init__(self, config, channels, workers, heartbeat_timeout=30, report_interval=60):
+        self.config = config
+        self.heartbeat_timeout = heartbeat_timeout
+        self.report_interval = report_interval
+        self.covasnext_client = None
+        self.published = 0
+        self.restarts = 0
+        # Counters last reported by workers that were restarted since
+        self.retired = Counter()
+
+        workers = max(1, min(workers, len(channels)))
+        self.workers = [
+            {'channels': channels[i::workers], 'process': None, 'connection': None, 'last_seen': 0.0, 'restart_at': 0.0, 'stats': {}}
+            for i in range(workers)
+        ]
+
+    def start_worker(self, worker_id):
+        worker = self.workers[worker_id]
+        # A pipe per worker, and no shared lock or event a killed or frozen worker could leave held
+        connection, worker_connection = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=run_worker,
+            args=(worker_id, worker['channels'], self.config, worker_connection),
+            name=f"covas-worker-{worker_id}"
+        )
+        process.daemon = True
+        process.start()
+        worker_connection.close()
+        worker['process'] = process
+        worker['connection'] = connection
+        worker['last_seen'] = time.time()
+        log(f"Worker {worker_id} started (pid {process.pid}): {', '.join(worker['channels'])}")
+
+    def check_workers(self, now):
+        """Restart workers that crashed or stopped sending heartbeats"""
+        for worker_id, worker in enumerate(self.workers):
+            process = worker['process']
+            if process is not None and process.is_alive():
+                if now - worker['last_seen'] <= self.heartbeat_timeout:
+                    continue
+                log(f"Worker {worker_id} missed its heartbeat for {int(now - worker['last_seen'])} seconds, restarting")
+                self.stop_worker(worker)
+            elif process is not None:
+                log(f"Worker {worker_id} exited with code {process.exitcode}, restarting")
+
+            if process is not None:
+                self.close_connection(worker)
+                worker['process'] = None
+                for channel_stats in worker['stats'].values():
+                    self.retired.update({key: channel_stats.get(key, 0) for key in COUNTERS})
+                worker['stats'] = {}
+                worker['restart_at'] = now + RECONNECT_DELAY
+                self.restarts += 1
+            elif now >= worker['restart_at']:
+                self.start_worker(worker_id)
+
+    def stop_worker(self, worker, timeout=5.0):
+        """Ask a worker to stop and only kill it if it does not exit in time"""
+        self.request_stop(worker)
+        self.end_process(worker['process'], timeout)
+
+    def end_process(self, process, timeout=5.0):
+        """Wait for a process that was asked to stop, terminate it and as a last resort kill it"""
+        process.join(timeout=timeout)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout=timeout)
+        if process.is_alive():
+            process.kill()
+            process.join(timeout=timeout)
+
+    def request_stop(self, worker):
+        try:
+            if worker['connection'] is not None:
+                worker['connection'].send('stop')
+        except OSError:
+            pass
+
+    def close_connection(self, worker):
+        # A killed worker can leave half a message in its pipe, never read from it again
+        if worker['connection'] is not None:
+            worker['connection'].close()
+            worker['connection'] = None
+
+    def receive(self, timeout):
+        """Handle everything the workers sent, waiting up to timeout seconds for the first message"""
+        connections = {worker['connection']: worker for worker in self.workers if worker['connection'] is not None}
+        if not connections:
+            time.sleep(timeout)
+            return
+        for connection in multiprocessing.connection.wait(list(connections), timeout):
+            worker = connections[connection]
+            try:
+                kind, payload = connection.recv()
+            except (EOFError, OSError):
+                # The worker is gone, check_workers restarts it
+                self.close_connection(worker)
+                continue
+            if kind == 'publish':
+                try:
+                    self.covasnext_client.publish(payload)
+                    self.published += 1
+                except Exception as e:
+                    log(f"Error sending to EDMesg: {str(e)}")
+            elif kind == 'stats':
+                worker['stats'] = payload
+                worker['last_seen'] = time.time()
+
+    def metrics(self):
+        """Aggregated counters over all workers"""
+        channels = [channel_stats for worker in self.workers for channel_stats in worker['stats'].values()]
+        return {
+            'workers': sum(1 for worker in self.workers if worker['process'] is not None and worker['process'].is_alive()),
+            'channels': sum(len(worker['channels']) for worker in self.workers),
+            'connected': sum(1 for channel_stats in channels if channel_stats.get('connected')),
+            'messages': self.retired['messages'] + sum(channel_stats.get('messages', 0) for channel_stats in channels),
+            'instructions': self.retired['instructions'] + sum(channel_stats.get('instructions', 0) for channel_stats in channels),
+            'bytes_raw': self.retired['bytes_raw'] + sum(channel_stats.get('bytes_raw', 0) for channel_stats in channels),
+            'bytes_published': self.retired['bytes_published'] + sum(channel_stats.get('bytes_published', 0) for channel_stats in channels),
+            'published': self.published,
+            'restarts': self.restarts
+        }
+
+    def report(self):
+        m = self.metrics()
+        log(f"STATS - {m['workers']}/{len(self.workers)} workers, {m['connected']}/{m['channels']} channels connected, "
+            f"{m['messages']} messages, {m['instructions']} instructions, {m['published']} published "
+            f"({m['bytes_published'] / 1024:.1f} KB of {m['bytes_raw'] / 1024:.1f} KB raw), {m['restarts']} restarts")
+
+    def run(self):
+        self.covasnext_client = create_covasnext_client()
+        try:
+            for worker_id in range(len(self.workers)):
+                self.start_worker(worker_id)
+
+            last_check = last_report = time.time()
+            while True:
+                self.receive(timeout=1.0)
+
+                now = time.time()
+                if now - last_check >= 1.0:
+                    self.check_workers(now)
+                    last_check = now
+                if now - last_report >= self.report_interval:
+                    self.report()
+                    last_report = now
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for worker in self.workers:
+                if worker['process'] is not None and worker['process'].is_alive():
+                    self.request_stop(worker)
+            for worker in self.workers:
+                if worker['process'] is not None:
+                    self.end_process(worker['process'])
+                self.close_connection(worker)
+            self.report()
+            try:
+                self.covasnext_client.close()
+            except:
+                pass
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='COVAS:NEXT Twitch Integration - Multi-process Supervisor')
+    parser.add_argument('--config', default='covas_twitch_config.json', help='Path to the configuration file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--heartbeat-timeout', type=float, default=30, help='Restart a worker after this many seconds without a heartbeat')
+    parser.add_argument('--report-interval', type=float, default=60, help='Seconds between aggregated metrics log lines')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    config = load_or_create_config(args.config)
+    channels = get_channels(config)
+    if not channels or not str(config.get('bot_name', '')).strip():
+        log(f"Error: Please set channels (or channel) and bot_name in {args.config}")
+        sys.exit(1)
+
+    log("=== Starting COVAS:NEXT Twitch Integration (supervisor) ===")
+    log(f"Channels: {', '.join(channels)}")
+    log(f"Bot Name: {config['bot_name']}")
+    log(f"Workers: {max(1, min(args.workers, len(channels)))}")
+    log("=== Configuration Complete ===")
+
+    Supervisor(config, channels, args.workers, args.heartbeat_timeout, args.report_interval).run()
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
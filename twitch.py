@@ -7,7 +7,14 @@ import time
 import json
 import os
 import io
+import threading
 import requests
+from user_state import UserStateCache, FLAG_THROTTLED
+from chat_summary import ChatSummarizer
+from moderation_pool import ModerationPool, UNMODERATED
+from profiler import BotProfiler
+from load_shedding import LoadShedder, LEVEL_FULL, LEVEL_NAMES
+from compaction import PayloadCompactor, parse_emote_tag, DEFAULT_EMOTES, DEFAULT_MAX_LENGTH
 from EDMesg.base import EDMesgEvent
 from EDMesg.TwitchIntegration import create_twitch_provider, TwitchNotificationEvent
 from EDMesg.CovasNext import ExternalChatNotification, ExternalBackgroundChatNotification, create_covasnext_client
@@ -21,6 +28,28 @@ DEFAULT_CONFIG = {
     "bot_name": "",
     "openai_verification": False,
     "openai_api_key": "",
+    "immediate_reactions": [
+        {"text": "@COVAS", "ignore_case": True, "whole_word": False, "prefix": ""}
+    ],
+    "user_reaction_cooldown": 30,
+    "user_rate_limit": 5,
+    "user_rate_window": 10,
+    "flagged_user_timeout": 300,
+    "user_cache_size": 5000,
+    "chat_summary_threshold": 30,
+    "chat_summary_interval": 60,
+    "chat_summary_window": 60,
+    "moderation_workers": 4,
+    "moderation_max_in_flight": 32,
+    "load_shedding": True,
+    "shed_rate_limit": 10,
+    "shed_queue_limit": 16,
+    "shed_latency_limit": 1.0,
+    "shed_sample_every": 4,
+    "shed_cooldown": 10,
+    "compaction": True,
+    "compaction_emotes": list(DEFAULT_EMOTES),
+    "compaction_max_length": dict(DEFAULT_MAX_LENGTH),
     "patterns": {
         "follow": "{user} just followed!",
         "tip": "{user} just tipped {amount}! Message: {message}",
@@ -47,6 +76,20 @@ DEFAULT_CONFIG = {
     }
 }
 
+# Username and text of a chat message in a raw IRC line
+PRIVMSG_RE = re.compile(r":([^!]+)![^@]+@[^.]+\.tmi\.twitch\.tv PRIVMSG #[^:]+:(.+)")
+
+def parse_irc_tags(line):
+    """Split the IRCv3 tags off a raw IRC line, returns (tags, rest of the line)"""
+    if not line.startswith('@'):
+        return {}, line
+    tag_string, _, rest = line[1:].partition(' ')
+    tags = {}
+    for tag in tag_string.split(';'):
+        key, _, value = tag.partition('=')
+        tags[key] = value
+    return tags, rest
+
 def load_or_create_config(config_path='covas_twitch_config.json'):
     """Load existing config or create new one with defaults"""
     if os.path.exists(config_path):
@@ -66,6 +109,9 @@ def load_or_create_config(config_path='covas_twitch_config.json'):
                             for key in DEFAULT_CONFIG[section]:
                                 if key not in merged_config[section]:
                                     merged_config[section][key] = DEFAULT_CONFIG[section][key]
+                    # Carry over the single trigger string used by older configs
+                    if 'immediate_reactions' not in config and 'immediate_reaction' in config:
+                        merged_config['immediate_reactions'] = get_immediate_reactions(config)
                 return merged_config
         except (json.JSONDecodeError, IOError) as e:
             log(f"Error loading config: {str(e)}")
@@ -87,6 +133,11 @@ def parse_args():
     parser.add_argument('--patterns', required=True, help='JSON string of event patterns and instructions')
     parser.add_argument('--openai-verification', action='store_true', help='Enable OpenAI verification')
     parser.add_argument('--openai-api-key', help='OpenAI API key')
+    parser.add_argument('--profile', type=float, nargs='?', const=60, metavar='SECONDS', help='Capture a profile for SECONDS (default 60) after startup')
+    parser.add_argument('--profile-mode', choices=['sampling', 'cprofile'], default='sampling', help='Sample all threads into collapsed stacks, or run cProfile on the read loop and moderation workers')
+    parser.add_argument('--profile-dir', default='profiles', help='Directory profile captures are written to')
+    parser.add_argument('--profile-memory', action='store_true', help='Also trace allocations during captures (slows the bot down while capturing)')
+    parser.add_argument('--control-stdin', action='store_true', help='Accept "profile [SECONDS]" commands on stdin')
     return parser.parse_args()
 
 def log(message, is_debug=False):
@@ -98,9 +149,9 @@ def log(message, is_debug=False):
     except Exception as e:
         print(f"Error logging message: {str(e)}")
 
-def create_pattern_matchers(config, channel_name):
-    """Create regex patterns and their corresponding formatters based on configured patterns"""
-    pattern_matchers = []
+def create_event_matchers(config, channel_name):
+    """Create (event_key, regex, formatter) for every configured event pattern"""
+    event_matchers = []
     
     # Define event types and their variable groups
     events = {
@@ -133,7 +184,8 @@ def create_pattern_matchers(config, channel_name):
             def make_formatter(key, num_vars):
                 return lambda m: (key, tuple(m.group(i+1) for i in range(num_vars)))
             
-            pattern_matchers.append((
+            event_matchers.append((
+                event_key,
                 re.compile(regex_pattern, re.IGNORECASE),
                 make_formatter(event_key, len(variables))
             ))
@@ -142,39 +194,282 @@ def create_pattern_matchers(config, channel_name):
             log(f"ERROR - Failed to create pattern for {event_key}: {str(e)}")
             continue
     
-    return pattern_matchers
+    return event_matchers
+
+def create_pattern_matchers(config, channel_name):
+    """Create regex patterns and their corresponding formatters based on configured patterns"""
+    return [(regex, formatter) for _, regex, formatter in create_event_matchers(config, channel_name)]
+
+def format_instruction(instruction, event_key, groups, channel_name):
+    """Fill an instruction template with the groups captured by an event pattern, raises KeyError for unknown placeholders"""
+    # Format instruction with captured groups
+    format_args = {
+        'user': groups[0],
+        'channel': channel_name
+    }
+    
+    # Add additional parameters based on event type
+    if event_key in ['tip', 'bits']:
+        format_args.update({
+            'amount': groups[1],
+            'message': groups[2]
+        })
+    elif event_key in ['host', 'raid']:
+        format_args['viewers'] = groups[1]
+    elif event_key == 'resub':
+        format_args['months'] = groups[1]
+    elif event_key == 'redeem':
+        format_args['reward'] = groups[1]
+    elif event_key == 'order':
+        format_args['item'] = groups[1]
+    
+    return instruction.format(**format_args)
+
+def get_immediate_reactions(config):
+    """
+    Return the configured immediate reaction triggers as a list of dicts.
+    Older configs only have a single case-sensitive 'immediate_reaction' string.
+    """
+    triggers = config.get('immediate_reactions')
+    if isinstance(triggers, list):
+        return [trigger for trigger in triggers if isinstance(trigger, dict)]
+
+    legacy = config.get('immediate_reaction', '')
+    if isinstance(legacy, str) and legacy:
+        return [{"text": legacy, "ignore_case": False, "whole_word": False, "prefix": ""}]
+    return []
+
+def create_reaction_matcher(config):
+    """
+    Compile all immediate reaction triggers into a single regex.
+    Returns a (regex, triggers) tuple, or None if no trigger is configured.
+    """
+    triggers = []
+    alternatives = []
+
+    for trigger in get_immediate_reactions(config):
+        text = str(trigger.get('text', '')).replace('{bot_name}', str(config.get('bot_name', '')))
+        if not text.strip():
+            continue
+
+        regex_pattern = re.escape(text)
+        if trigger.get('whole_word', False):
+            regex_pattern = rf"(?<!\w){regex_pattern}(?!\w)"
+        if trigger.get('ignore_case', True):
+            regex_pattern = f"(?i:{regex_pattern})"
+
+        # The group name maps a match back to the trigger it came from
+        alternatives.append(f"(?P<t{len(triggers)}>{regex_pattern})")
+        triggers.append(trigger)
+
+    if not alternatives:
+        return None
+
+    try:
+        return re.compile('|'.join(alternatives)), triggers
+    except re.error as e:
+        log(f"ERROR - Failed to create immediate reaction matcher: {str(e)}")
+        return None
+
+def match_immediate_reaction(reaction_matcher, message):
+    """Return the trigger found in message, or None"""
+    if reaction_matcher is None:
+        return None
+    regex, triggers = reaction_matcher
+    match = regex.search(message)
+    if not match:
+        return None
+    return triggers[int(match.lastgroup[1:])]
+
+def create_pipeline(config, channel_name):
+    """Build the per-connection state used by process_event so it is not rebuilt for every message"""
+    return {
+        'reaction_matcher': create_reaction_matcher(config),
+        'user_cache': UserStateCache(config.get('user_cache_size', 5000)),
+        'chat_summarizer': ChatSummarizer(
+            window=config.get('chat_summary_window', 60),
+            interval=config.get('chat_summary_interval', 60),
+            rate_threshold=config.get('chat_summary_threshold', 30)
+        ) if config.get('chat_summary_threshold', 30) else None,
+        'load_shedder': LoadShedder(
+            rate_limit=config.get('shed_rate_limit', 10),
+            queue_limit=config.get('shed_queue_limit', 16),
+            latency_limit=config.get('shed_latency_limit', 1.0),
+            sample_every=config.get('shed_sample_every', 4),
+            cooldown=config.get('shed_cooldown', 10),
+            log=log
+        ) if config.get('load_shedding', True) else None,
+        'compactor': PayloadCompactor(
+            emotes=config.get('compaction_emotes'),
+            max_length=config.get('compaction_max_length'),
+            log=log
+        ) if config.get('compaction', True) else None,
+        # Only messages from these users are checked against the event patterns
+        'event_sources': {str(config.get('bot_name', '')).lower(), channel_name.lower().lstrip('#')}
+    }
 
-def process_event(username, message, channel_name, pattern_matchers, config, covasnext_client):
-    """Process various Twitch events using configured patterns"""
-    # Check message with OpenAI Moderation if enabled
-    if config.get('openai_verification', False) and config.get('openai_api_key'):
-        is_flagged, categories = check_moderation(message, config['openai_api_key'])
+def compact_payload(pipeline, text, kind, emotes=None, cap=True):
+    """Normalize whitespace, collapse repeats and cap the length of text about to be published"""
+    compactor = pipeline.get('compactor')
+    if compactor is None:
+        return text
+    return compactor.compact(text, kind, emotes, cap)
+
+def publish_notification(covasnext_client, pipeline, notification, raw_text):
+    """Publish a notification and count its size against the text it had before compaction"""
+    covasnext_client.publish(notification)
+    compactor = pipeline.get('compactor')
+    if compactor is not None:
+        compactor.record(raw_text, notification.text)
+
+def publish_chat_digest(pipeline, channel_name, config, covasnext_client, now=None):
+    """Publish the digest of held back chat lines if one is due"""
+    summarizer = pipeline.get('chat_summarizer')
+    if summarizer is None:
+        return
+    digest = summarizer.pop_digest(channel_name, time.time() if now is None else now)
+    if digest:
+        log(f"CHAT SUMMARY - {digest}")
+        try:
+            publish_notification(
+                covasnext_client,
+                pipeline,
+                ExternalBackgroundChatNotification(
+                    service='twitch',
+                    username=config['bot_name'],
+                    text=compact_payload(pipeline, digest, 'digest')
+                ),
+                digest
+            )
+        except Exception as e:
+            log(f"Error sending to EDMesg: {str(e)}")
+
+def admit_message(username, config, pipeline, now):
+    """Per-user checks run before moderation, returns False for recently flagged or throttled users"""
+    user = pipeline['user_cache'].get(username)
+    if user.name_lower in pipeline['event_sources']:
+        return True
+
+    # Skip users that were recently flagged by moderation
+    if user.is_flagged(now):
+        log(f"Skipping message from recently flagged user {username}", True)
+        return False
+
+    # Throttle spammy users before spending a moderation call on them
+    rate_limit = config.get('user_rate_limit', 5)
+    message_count = user.record_message(now, config.get('user_rate_window', 10))
+    if rate_limit and message_count > rate_limit:
+        if not user.flags & FLAG_THROTTLED:
+            log(f"Throttling {username} - more than {rate_limit} messages in {config.get('user_rate_window', 10)} seconds")
+        user.flags |= FLAG_THROTTLED
+        return False
+    user.flags &= ~FLAG_THROTTLED
+    return True
+
+def route_message(username, message, channel_name, pipeline, now):
+    """
+    Ask the load shedder what to do with a message, returns (keep, moderate).
+    Immediate reactions and event messages are always kept and moderated.
+    Shed chat is still counted for the digest, only its own notification is skipped.
+    """
+    shedder = pipeline.get('load_shedder')
+    if shedder is None or shedder.level == LEVEL_FULL:
+        return True, True
+    priority = (username.lower() in pipeline['event_sources']
+                or match_immediate_reaction(pipeline['reaction_matcher'], message) is not None)
+    keep, moderate = shedder.route(priority)
+    if not keep and pipeline.get('chat_summarizer') is not None:
+        pipeline['chat_summarizer'].add(channel_name, username, message, now)
+    return keep, moderate
+
+def timed_check_moderation(text, api_key, pipeline):
+    """check_moderation that also reports its latency to the load shedder"""
+    started = time.time()
+    result = check_moderation(text, api_key)
+    if pipeline.get('load_shedder') is not None:
+        finished = time.time()
+        pipeline['load_shedder'].record_latency(finished - started, finished)
+    return result
+
+def process_event(username, message, channel_name, pattern_matchers, config, covasnext_client, pipeline=None, moderation=None, emotes=None):
+    """
+    Process various Twitch events using configured patterns.
+    moderation is an (is_flagged, categories) result from an earlier check_moderation call, or
+    UNMODERATED for a message the load shedder let through unchecked. In both cases the message
+    must already have passed admit_message.
+    emotes is the set of emote names found through the message's IRCv3 emotes tag.
+    """
+    if pipeline is None:
+        pipeline = create_pipeline(config, channel_name)
+
+    now = time.time()
+    user = pipeline['user_cache'].get(username)
+    is_event_source = user.name_lower in pipeline['event_sources']
+
+    if moderation is None:
+        if not admit_message(username, config, pipeline, now):
+            return False
+        keep, moderate = route_message(username, message, channel_name, pipeline, now)
+        if not keep:
+            publish_chat_digest(pipeline, channel_name, config, covasnext_client, now)
+            return False
+        # Check message with OpenAI Moderation if enabled
+        if moderate and config.get('openai_verification', False) and config.get('openai_api_key'):
+            moderation = timed_check_moderation(message, config['openai_api_key'], pipeline)
+    elif not is_event_source and user.is_flagged(now):
+        # Flagged while this message was waiting for its own moderation result
+        log(f"Skipping message from recently flagged user {username}", True)
+        return False
+
+    if moderation is not None and moderation is not UNMODERATED:
+        is_flagged, categories = moderation
         if is_flagged:
             log(f"Message from {username} was flagged by moderation API: {categories}")
+            user.flagged_until = now + config.get('flagged_user_timeout', 300)
             return False
     
-    # Check for immediate reaction first
-    immediate_reaction = config.get('immediate_reaction', '')
-    if immediate_reaction and immediate_reaction in message:
+    # Check for immediate reaction first, limited to one per user per cooldown
+    trigger = match_immediate_reaction(pipeline['reaction_matcher'], message)
+    if trigger is not None and user.reaction_on_cooldown(now, config.get('user_reaction_cooldown', 30)):
+        log(f"Immediate reaction from {username} is on cooldown, sending as chat", True)
+        trigger = None
+    if trigger is not None:
+        user.last_reaction = now
         log(f"IMMEDIATE REACTION - {username}: {message}", True)
-        covasnext_client.publish(
+        prefix = str(trigger.get('prefix', '')).strip()
+        raw_text = f"Reply to twitch message from {username}: {message}"
+        text = f"Reply to twitch message from {username}: {compact_payload(pipeline, message, 'reaction', emotes)}"
+        if prefix:
+            raw_text = f"{prefix} {raw_text}"
+            text = f"{prefix} {text}"
+        publish_notification(
+            covasnext_client,
+            pipeline,
             ExternalChatNotification(
                 service='twitch',
                 username=config['bot_name'],
-                text=f"Reply to twitch message from {username}: {message}"
-            )
+                text=text
+            ),
+            raw_text
         )
     else:
         log(f"CHAT - {username}: {message}")
-        covasnext_client.publish(
-            ExternalBackgroundChatNotification(
-                service='twitch',
-                username=username,
-                text=message
+        # Busy chat is held back for the digest instead of being forwarded line by line
+        summarizer = pipeline['chat_summarizer']
+        if is_event_source or summarizer is None or not summarizer.add(channel_name, username, message, now):
+            publish_notification(
+                covasnext_client,
+                pipeline,
+                ExternalBackgroundChatNotification(
+                    service='twitch',
+                    username=username,
+                    text=compact_payload(pipeline, message, 'chat', emotes)
+                ),
+                message
             )
-        )
+    publish_chat_digest(pipeline, channel_name, config, covasnext_client, now)
 
-    if username.lower() in [config['bot_name'].lower(), channel_name.lower()]:
+    if is_event_source:
         for pattern, formatter in pattern_matchers:
             try:
                 match = pattern.match(message)
@@ -182,39 +477,23 @@ def process_event(username, message, channel_name, pattern_matchers, config, cov
                     event_key, groups = formatter(match)
                     instruction = config['instructions'][event_key]
                     
-                    # Format instruction with captured groups
-                    format_args = {
-                        'user': groups[0],
-                        'channel': channel_name
-                    }
-                    
-                    # Add additional parameters based on event type
-                    if event_key in ['tip', 'bits']:
-                        format_args.update({
-                            'amount': groups[1],
-                            'message': groups[2]
-                        })
-                    elif event_key in ['host', 'raid']:
-                        format_args['viewers'] = groups[1]
-                    elif event_key == 'resub':
-                        format_args['months'] = groups[1]
-                    elif event_key == 'redeem':
-                        format_args['reward'] = groups[1]
-                    elif event_key == 'order':
-                        format_args['item'] = groups[1]
-                    
                     try:
-                        formatted_instruction = instruction.format(**format_args)
+                        formatted_instruction = format_instruction(instruction, event_key, groups, channel_name)
                         log(f"INSTRUCTION: {formatted_instruction}")
                         
                         # Send instruction to EDMesg using TwitchNotificationEvent
                         try:
-                            covasnext_client.publish(
+                            compacted_message = compact_payload(pipeline, message, 'event', emotes)
+                            compacted_instruction = compact_payload(pipeline, formatted_instruction, 'event', emotes, cap=False)
+                            publish_notification(
+                                covasnext_client,
+                                pipeline,
                                 ExternalChatNotification(
                                     service='twitch',
                                     username=config['bot_name'],
-                                    text=f"{message} - {formatted_instruction}"
-                                )
+                                    text=f"{compacted_message} - {compacted_instruction}"
+                                ),
+                                f"{message} - {formatted_instruction}"
                             )
                             log(f"Sent instruction to EDMesg: {formatted_instruction}")
                         except Exception as e:
@@ -272,42 +551,80 @@ def check_moderation(text, api_key):
         log(f"[ERROR] Moderation check failed: {str(e)}")
         return False, {}
 
-def main():
-    args = parse_args()
-    channel_name = args.channel.lower()
+def read_control_commands(profiler):
+    """Read control commands from stdin, used by the GUI to trigger a profile capture"""
+    for line in sys.stdin:
+        command = line.strip().split()
+        if not command:
+            continue
+        if command[0] == 'profile':
+            try:
+                duration = float(command[1]) if len(command) > 1 else 60
+            except ValueError:
+                log(f"Invalid profile duration: {command[1]}")
+                continue
+            if not profiler.request(duration):
+                log("PROFILE - A capture is already running")
+        else:
+            log(f"Unknown command: {command[0]}")
+
+def run_bot(config, channel, stop_event=None, stats=None, profiler=None, covasnext_client=None):
+    """
+    Connect to Twitch chat and process messages until stop_event is set or the connection fails.
+    stats, if given, is a dict that is updated with connection state and message counters.
+    profiler, if given, is a BotProfiler whose captures are started and stopped from the read loop.
+    covasnext_client, if given, is used for publishing instead of creating (and closing) our own.
+    """
+    channel_name = channel.lower()
     if not channel_name.startswith('#'):
         channel_name = f"#{channel_name}"
-    
-    # Initialize client as None
-    covasnext_client = None
-    
-    try:
-        config = json.loads(args.patterns)
-        required_sections = ['patterns', 'instructions']
-        for section in required_sections:
-            if section not in config:
-                raise ValueError(f"Missing required section: {section}")
-        
-    except json.JSONDecodeError:
-        log("Error: Invalid configuration JSON")
-        sys.exit(1)
-    except ValueError as e:
-        log(f"Error: {str(e)}")
-        sys.exit(1)
-    
-    pattern_matchers = create_pattern_matchers(config, args.channel)
-    
-    # Log startup configuration
-    log("=== Starting COVAS:NEXT Twitch Integration ===")
-    log(f"Channel: {args.channel}")
-    log(f"Bot Name: {args.bot_name}")
-    log(f"OpenAI Verification: {'Enabled' if config.get('openai_verification', False) else 'Disabled'}")
-    log(f"OpenAI API Key: {'Configured' if config.get('openai_api_key') else 'Not Configured'}")
-    log("=== Configuration Complete ===")
+
+    if stats is None:
+        stats = {}
+    stats.update({
+        'connected': False,
+        'started_at': time.time(),
+        'messages': 0,
+        'instructions': 0
+    })
+
+    pattern_matchers = create_pattern_matchers(config, channel)
+    pipeline = create_pipeline(config, channel)
+    shedder = pipeline['load_shedder']
+    if shedder is not None:
+        stats['load_level'] = LEVEL_NAMES[shedder.level]
+        stats['level_changes'] = shedder.level_changes
+        stats['shed'] = shedder.shed
+
+    owns_client = covasnext_client is None
+    sock = None
+    moderation_pool = None
+
+    def handle_message(username, message, moderation=None, emotes=None):
+        if process_event(username, message, channel, pattern_matchers, config, covasnext_client, pipeline, moderation, emotes):
+            stats['instructions'] += 1
+
+    def release_moderated():
+        # Hand finished moderation results on in the order the messages arrived
+        for (username, message, emotes), moderation in moderation_pool.completed():
+            handle_message(username, message, moderation, emotes)
 
     # Initialize notification clients
     try:
-        covasnext_client = create_covasnext_client()
+        if owns_client:
+            covasnext_client = create_covasnext_client()
+
+        # Moderate on a thread pool so one slow API call does not hold up the whole chat
+        if config.get('openai_verification', False) and config.get('openai_api_key') and config.get('moderation_workers', 4) > 0:
+            api_key = config['openai_api_key']
+            moderate_text = lambda text: timed_check_moderation(text, api_key, pipeline)
+            if profiler is not None:
+                moderate_text = profiler.wrap(moderate_text)
+            moderation_pool = ModerationPool(
+                moderate_text,
+                workers=config.get('moderation_workers', 4),
+                max_in_flight=config.get('moderation_max_in_flight', 32)
+            )
         
         HOST = "irc.chat.twitch.tv"
         PORT = 443
@@ -318,26 +635,86 @@ def main():
         sock = socket.socket()
         sock = context.wrap_socket(sock, server_hostname=HOST)
         sock.connect((HOST, PORT))
+        # Wake up regularly so a stop request is noticed on a quiet channel
+        sock.settimeout(1.0)
         
+        # Ask for IRCv3 tags, they carry the emote positions used by payload compaction
+        sock.send("CAP REQ :twitch.tv/tags\r\n".encode("utf-8"))
         sock.send(f"NICK {NICK}\r\n".encode("utf-8"))
         sock.send(f"USER {NICK} 8 * :{NICK}\r\n".encode("utf-8"))
         sock.send(f"JOIN {CHANNEL}\r\n".encode("utf-8"))
 
         log("Connected successfully to Twitch chat")
+        stats['connected'] = True
+        compactor = pipeline['compactor']
+        buffer = b""
 
-        while True:
+        while stop_event is None or not stop_event.is_set():
+            if profiler is not None:
+                profiler.poll()
+            if shedder is not None:
+                shedder.update(time.time(), len(moderation_pool.pending) if moderation_pool is not None else 0)
+                stats['load_level'] = LEVEL_NAMES[shedder.level]
+            if compactor is not None:
+                stats['bytes_raw'] = compactor.raw_bytes
+                stats['bytes_published'] = compactor.published_bytes
             try:
-                resp = sock.recv(2048).decode("utf-8")
+                if moderation_pool is not None:
+                    # Poll faster while results are outstanding so they are not held back by a quiet chat
+                    sock.settimeout(0.1 if moderation_pool.pending else 1.0)
+                data = sock.recv(4096)
+                if not data:
+                    log("Connection closed by Twitch")
+                    break
+
+                # A read can end in the middle of a line, keep the rest for the next one
+                buffer += data
+                lines = buffer.split(b"\r\n")
+                buffer = lines.pop()
+                if len(buffer) > 65536:
+                    buffer = b""
+
+                for raw_line in lines:
+                    try:
+                        resp = raw_line.decode("utf-8", errors="replace")
 
-                if resp.startswith("PING"):
-                    sock.send("PONG :tmi.twitch.tv\r\n".encode("utf-8"))
-                    continue
+                        if resp.startswith("PING"):
+                            sock.send("PONG :tmi.twitch.tv\r\n".encode("utf-8"))
+                            continue
 
-                chat_match = re.search(r":([^!]+)![^@]+@[^.]+\.tmi\.twitch\.tv PRIVMSG #[^:]+:(.+)", resp.strip())
-                if chat_match:
-                    username, message = chat_match.groups()
-                    process_event(username, message, args.channel, pattern_matchers, config, covasnext_client)
+                        tags, resp = parse_irc_tags(resp)
+                        chat_match = PRIVMSG_RE.search(resp.strip())
+                        if chat_match:
+                            username, message = chat_match.groups()
+                            emotes = parse_emote_tag(tags.get('emotes'), message) if compactor is not None else None
+                            stats['messages'] += 1
+                            if shedder is not None:
+                                shedder.record_message(time.time())
+                            if moderation_pool is None:
+                                handle_message(username, message, emotes=emotes)
+                            else:
+                                now = time.time()
+                                if admit_message(username, config, pipeline, now):
+                                    keep, moderate = route_message(username, message, channel, pipeline, now)
+                                    if keep:
+                                        # Make room first so no more than max_in_flight messages are ever held
+                                        if moderation_pool.is_full():
+                                            release_moderated()
+                                        moderation_pool.submit((username, message, emotes), message, moderate)
+                                    else:
+                                        publish_chat_digest(pipeline, channel, config, covasnext_client, now)
+                    except Exception as e:
+                        log(f"Error in message loop: {str(e)}")
 
+                if moderation_pool is not None:
+                    release_moderated()
+
+            except socket.timeout:
+                if moderation_pool is not None:
+                    release_moderated()
+                # Quiet channel, still deliver a pending chat digest
+                publish_chat_digest(pipeline, channel, config, covasnext_client)
+                continue
             except Exception as e:
                 log(f"Error in message loop: {str(e)}")
                 continue  # Changed from break to continue to keep the connection alive
@@ -345,12 +722,57 @@ def main():
     except Exception as e:
         log(f"Connection error: {str(e)}")
     finally:
+        stats['connected'] = False
+        if moderation_pool is not None:
+            moderation_pool.close()
+        if profiler is not None:
+            profiler.close()
+        try:
+            if sock is not None:
+                sock.close()
+        except:
+            pass
         try:
-            if covasnext_client is not None:
+            if owns_client and covasnext_client is not None:
                 covasnext_client.close()
         except:
             pass
-        sys.exit(1)  # Only exit if we've hit a fatal error
+
+def main():
+    args = parse_args()
+    
+    try:
+        config = json.loads(args.patterns)
+        required_sections = ['patterns', 'instructions']
+        for section in required_sections:
+            if section not in config:
+                raise ValueError(f"Missing required section: {section}")
+        
+    except json.JSONDecodeError:
+        log("Error: Invalid configuration JSON")
+        sys.exit(1)
+    except ValueError as e:
+        log(f"Error: {str(e)}")
+        sys.exit(1)
+    
+    # Log startup configuration
+    log("=== Starting COVAS:NEXT Twitch Integration ===")
+    log(f"Channel: {args.channel}")
+    log(f"Bot Name: {args.bot_name}")
+    log(f"OpenAI Verification: {'Enabled' if config.get('openai_verification', False) else 'Disabled'}")
+    log(f"OpenAI API Key: {'Configured' if config.get('openai_api_key') else 'Not Configured'}")
+    log("=== Configuration Complete ===")
+
+    profiler = BotProfiler(args.profile_dir, args.profile_mode, memory=args.profile_memory, log=log)
+    if args.profile:
+        profiler.request(args.profile)
+    if args.control_stdin and sys.stdin is not None:
+        control_thread = threading.Thread(target=read_control_commands, args=(profiler,))
+        control_thread.daemon = True
+        control_thread.start()
+
+    run_bot(config, args.channel, profiler=profiler)
+    sys.exit(1)  # Only exit if we've hit a fatal error
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,51 @@
+from collections import OrderedDict
+
+# Bits for UserState.flags, a flagged user is tracked through flagged_until
+FLAG_THROTTLED = 1  # Currently over the message rate limit
+
+class UserState:
+    """What we remember about a single chatter"""
+    __slots__ = ('name_lower', 'window_start', 'window_count', 'last_reaction', 'flagged_until', 'flags')
+
+    def __init__(self, username):
+        self.name_lower = username.lower()
+        self.window_start = 0.0
+        self.window_count = 0
+        self.last_reaction = 0.0
+        self.flagged_until = 0.0
+        self.flags = 0
+
+    def record_message(self, now, window):
+        """Count a message in the current rate window and return the count so far"""
+        if now - self.window_start >= window:
+            self.window_start = now
+            self.window_count = 0
+        self.window_count += 1
+        return self.window_count
+
+    def is_flagged(self, now):
+        return self.flagged_until > now
+
+    def reaction_on_cooldown(self, now, cooldown):
+        return cooldown > 0 and now - self.last_reaction < cooldown
+
+class UserStateCache:
+    """Bounded table of UserState records, least recently seen users are evicted first"""
+
+    def __init__(self, max_size=5000):
+        self.max_size = max(1, int(max_size))
+        self.users = OrderedDict()
+
+    def get(self, username):
+        state = self.users.get(username)
+        if state is None:
+            state = UserState(username)
+            self.users[username] = state
+            if len(self.users) > self.max_size:
+                self.users.popitem(last=False)
+        else:
+            self.users.move_to_end(username)
+        return state
+
+    def __len__(self):
+        return len(self.users)